@@ -1,16 +1,72 @@
-from typing import Set
-from sqlalchemy.orm import Session
+from typing import FrozenSet
+from sqlalchemy import text as sql_text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from cat.log import log
 from .db import AllowedEntity, EntitySource, get_engine, Base
 import os
 import json
+import queue
+import threading
+from collections import OrderedDict
 
-_allowedlist: Set[str] = set()
+# Immutable snapshot replaced atomically on mutation: readers (is_allowed)
+# get a stable pointer with no locking, writers copy-on-write under the lock.
+_allowedlist: FrozenSet[str] = frozenset()
 _engine = None
+_SessionFactory = None
+
+# Write-behind queue: add_entity enqueues and a background thread flushes
+# batches in a single transaction, so callers never wait on a commit.
+_write_queue: "queue.Queue" = queue.Queue()
+_writer_thread = None
+_BATCH_SIZE = 256
+_FLUSH_INTERVAL = 1.0  # seconds
+
+# _init_lock serializes (re-)initialization; _allowedlist_lock serializes
+# writers replacing the snapshot. is_allowed stays lockless: it only reads
+# the current snapshot reference.
+_init_lock = threading.Lock()
+_allowedlist_lock = threading.Lock()
+
+# Mirror of the INFO gate in chat_anonymizer: skip payload construction and
+# serialization entirely when the configured level filters the record.
+_LOG_INFO_ENABLED = os.getenv("CCAT_LOG_LEVEL", "INFO").upper() in ("DEBUG", "INFO")
+
+def _jlog(level: str, event: str, data: dict):
+    if level == 'info' and not _LOG_INFO_ENABLED:
+        return
+    getattr(log, level)(json.dumps({
+        "component": "ccat_anonymizer",
+        "event": event,
+        "data": data
+    }))
+
+
+# Bounded LRU of (text, source) pairs already handed to the writer, so repeat
+# sightings of the same entity from the same document skip the queue entirely.
+_source_cache: "OrderedDict" = OrderedDict()
+_SOURCE_CACHE_MAX = 10_000
 
 def init_allowedlist(db_path: str):
-    global _allowedlist, _engine
+    global _allowedlist, _engine, _SessionFactory
+    with _init_lock:
+        _init_allowedlist(db_path)
+
+def _init_allowedlist(db_path: str):
+    global _allowedlist, _engine, _SessionFactory
     try:
+        # Re-initialization (plugin reload, reset_db) invalidates everything
+        # keyed to the previous database: the (text, source) dedup cache would
+        # otherwise short-circuit re-ingestion of anything seen before the
+        # reset, and queued writes belong to the old file.
+        _source_cache.clear()
+        while True:
+            try:
+                _write_queue.get_nowait()
+            except queue.Empty:
+                break
+
         # Ensure directory exists
         db_dir = os.path.dirname(db_path)
         if db_dir and not os.path.exists(db_dir):
@@ -18,40 +74,109 @@ def init_allowedlist(db_path: str):
 
         _engine = get_engine(db_path)
         Base.metadata.create_all(_engine)
-        
-        with Session(_engine) as session:
-            # Cleanup orphans: remove entities with no source
-            subquery = session.query(EntitySource.entity_text)
-            deleted_orphans = session.query(AllowedEntity).filter(AllowedEntity.text.notin_(subquery)).delete(synchronize_session=False)
+
+        # Reuse one session factory; expire_on_commit=False avoids re-SELECTing
+        # attributes after each commit.
+        _SessionFactory = sessionmaker(bind=_engine, expire_on_commit=False)
+        _ensure_writer_thread()
+
+        with _SessionFactory() as session:
+            # Upgrade path for databases created before the UPSERT batching:
+            # their entity_source table has no unique constraint on
+            # (entity_text, source) and create_all never alters existing
+            # tables, so the ON CONFLICT target in _flush_batch would fail on
+            # every insert. Deduplicate any pre-existing rows, then back-fill
+            # the unique index (a valid ON CONFLICT target) and the
+            # entity_text index the anti-join cleanups rely on.
+            session.execute(sql_text(
+                "DELETE FROM entity_source WHERE id NOT IN "
+                "(SELECT MIN(id) FROM entity_source GROUP BY entity_text, source)"
+            ))
+            session.execute(sql_text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_entity_source "
+                "ON entity_source (entity_text, source)"
+            ))
+            session.execute(sql_text(
+                "CREATE INDEX IF NOT EXISTS ix_entity_source_entity_text "
+                "ON entity_source (entity_text)"
+            ))
+
+            # Cleanup orphans: remove entities with no source.
+            # NOT EXISTS compiles to an indexed anti-join instead of the
+            # correlated scan a NOT IN subquery would cost.
+            has_source = session.query(EntitySource).filter(EntitySource.entity_text == AllowedEntity.text).exists()
+            deleted_orphans = session.query(AllowedEntity).filter(~has_source).delete(synchronize_session=False)
             session.commit()
 
             entities = session.query(AllowedEntity).all()
-            _allowedlist = set()
+            loaded = set()
             for e in entities:
                 text = e.text.lower()
                 if e.entity_type == 'PHONE':
                     text = text.replace(" ", "")
-                _allowedlist.add(text)
-            
-        log.info(json.dumps({
-            "component": "ccat_anonymizer",
-            "event": "initialization",
-            "data": {
-                "status": "success",
-                "db_path": db_path,
-                "loaded_entities": len(_allowedlist),
-                "cleaned_orphans": deleted_orphans
-            }
-        }))
+                loaded.add(text)
+
+            with _allowedlist_lock:
+                _allowedlist = frozenset(loaded)
+
+        _jlog('info', 'initialization', {"status": "success", "db_path": db_path, "loaded_entities": len(_allowedlist), "cleaned_orphans": deleted_orphans})
+    except Exception as e:
+        _jlog('error', 'initialization', {"status": "error", "error": str(e)})
+
+def _flush_batch(items):
+    """Persist a batch of (text, entity_type, source) tuples in one transaction."""
+    global _engine
+
+    # Deduplicate within the batch
+    entity_rows = {}
+    source_rows = set()
+    for text, entity_type, source in items:
+        entity_rows.setdefault(text, entity_type)
+        source_rows.add((text, source))
+
+    try:
+        with _SessionFactory() as session:
+            # UPSERT: let SQLite skip rows that already exist instead of
+            # SELECTing for existence first.
+            session.execute(
+                sqlite_insert(AllowedEntity).on_conflict_do_nothing(index_elements=['text']),
+                [{"text": t, "entity_type": et} for t, et in entity_rows.items()]
+            )
+            session.execute(
+                sqlite_insert(EntitySource).on_conflict_do_nothing(index_elements=['entity_text', 'source']),
+                [{"entity_text": t, "source": s} for t, s in source_rows]
+            )
+            session.commit()
+
     except Exception as e:
-        log.error(json.dumps({
-            "component": "ccat_anonymizer",
-            "event": "initialization",
-            "data": {
-                "status": "error",
-                "error": str(e)
-            }
-        }))
+        _jlog('error', 'allowedlist_error', {"error": str(e), "batch_size": len(items)})
+
+def _writer_loop():
+    """Drain the write queue, flushing up to _BATCH_SIZE items per transaction."""
+    while True:
+        try:
+            item = _write_queue.get(timeout=_FLUSH_INTERVAL)
+        except queue.Empty:
+            continue
+
+        batch = [item]
+        while len(batch) < _BATCH_SIZE:
+            try:
+                batch.append(_write_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        _flush_batch(batch)
+
+def _ensure_writer_thread():
+    global _writer_thread
+    if _writer_thread is None or not _writer_thread.is_alive():
+        _writer_thread = threading.Thread(
+            target=_writer_loop,
+            daemon=True,
+            name="ccat_anonymizer_allowedlist_writer",
+        )
+        _writer_thread.start()
 
 def add_entity(text: str, entity_type: str, source: str = "unknown"):
     global _allowedlist, _engine
@@ -61,48 +186,68 @@ def add_entity(text: str, entity_type: str, source: str = "unknown"):
     if entity_type == 'PHONE':
         text = text.replace(" ", "")
 
-    if text in _allowedlist:
-        # Even if in allowedlist, we might need to add a new source
-        pass
+    key = (text, source)
+    if key in _source_cache:
+        _source_cache.move_to_end(key)
+        return
 
     if _engine is None:
         # Try to initialize if not already (fallback, though init_allowedlist should be called)
-        # But we need the path. 
-        log.warning(json.dumps({
-            "component": "ccat_anonymizer",
-            "event": "allowedlist_error",
-            "data": {
-                "error": "Allowedlist engine not initialized, cannot add entity"
-            }
-        }))
+        # But we need the path.
+        _jlog('warning', 'allowedlist_error', {"error": "Allowedlist engine not initialized, cannot add entity"})
         return
 
-    try:
-        with Session(_engine) as session:
-            # Check if entity exists
-            entity = session.query(AllowedEntity).filter_by(text=text).first()
-            if not entity:
-                entity = AllowedEntity(text=text, entity_type=entity_type)
-                session.add(entity)
-            
-            # Check if source exists for this entity
-            source_exists = session.query(EntitySource).filter_by(entity_text=text, source=source).first()
-            
-            if not source_exists:
-                new_source = EntitySource(entity_text=text, source=source)
-                session.add(new_source)
-                
-            session.commit()
-            _allowedlist.add(text)
-                
-    except Exception as e:
-        log.error(json.dumps({
-            "component": "ccat_anonymizer",
-            "event": "allowedlist_error",
-            "data": {
-                "error": str(e)
-            }
-        }))
+    # Non-blocking: the in-memory set is updated immediately so is_allowed
+    # sees the entity, while the database write happens in the background.
+    _write_queue.put_nowait((text, entity_type, source))
+    with _allowedlist_lock:
+        _allowedlist = _allowedlist | {text}
+
+    _source_cache[key] = None
+    if len(_source_cache) > _SOURCE_CACHE_MAX:
+        _source_cache.popitem(last=False)
+
+def add_entities(rows) -> int:
+    """Queue many (text, entity_type, source) rows in one pass.
+
+    Normalizes and deduplicates up front, updates the in-memory snapshot with
+    a single union, and enqueues only novel pairs; the background writer then
+    persists the whole batch in one transaction. Returns the number of novel
+    rows queued.
+    """
+    global _allowedlist
+
+    if _engine is None:
+        _jlog('warning', 'allowedlist_error', {"error": "Allowedlist engine not initialized, cannot add entities"})
+        return 0
+
+    novel = []
+    novel_texts = set()
+    for text, entity_type, source in rows:
+        # Normalize text
+        text = text.lower()
+        if entity_type == 'PHONE':
+            text = text.replace(" ", "")
+
+        key = (text, source)
+        if key in _source_cache:
+            _source_cache.move_to_end(key)
+            continue
+
+        novel.append((text, entity_type, source))
+        novel_texts.add(text)
+        _source_cache[key] = None
+        if len(_source_cache) > _SOURCE_CACHE_MAX:
+            _source_cache.popitem(last=False)
+
+    for row in novel:
+        _write_queue.put_nowait(row)
+
+    if novel_texts:
+        with _allowedlist_lock:
+            _allowedlist = _allowedlist | novel_texts
+
+    return len(novel)
 
 def remove_source(source: str):
     global _allowedlist, _engine
@@ -110,38 +255,49 @@ def remove_source(source: str):
         return
 
     try:
-        with Session(_engine) as session:
+        with _SessionFactory() as session:
             # 1. Delete all EntitySource entries with this source
             session.query(EntitySource).filter_by(source=source).delete()
             
-            # 2. Find entities that have no sources left
-            subquery = session.query(EntitySource.entity_text).distinct()
-            entities_to_remove = session.query(AllowedEntity).filter(AllowedEntity.text.notin_(subquery)).all()
+            # 2. Find entities that have no sources left (NOT EXISTS anti-join)
+            has_source = session.query(EntitySource).filter(EntitySource.entity_text == AllowedEntity.text).exists()
+            entities_to_remove = session.query(AllowedEntity).filter(~has_source).all()
             
+            removed_texts = {ent.text for ent in entities_to_remove}
             for ent in entities_to_remove:
-                if ent.text in _allowedlist:
-                    _allowedlist.remove(ent.text)
                 session.delete(ent)
+
+            with _allowedlist_lock:
+                _allowedlist = _allowedlist - removed_texts
             
             session.commit()
             
-            log.info(json.dumps({
-                "component": "ccat_anonymizer",
-                "event": "source_removed",
-                "data": {
-                    "source": source,
-                    "removed_entities": len(entities_to_remove)
-                }
-            }))
+            _jlog('info', 'source_removed', {"source": source, "removed_entities": len(entities_to_remove)})
 
     except Exception as e:
-        log.error(json.dumps({
-            "component": "ccat_anonymizer",
-            "event": "remove_source_error",
-            "data": {
-                "error": str(e)
-            }
-        }))
+        _jlog('error', 'remove_source_error', {"error": str(e)})
+
+def is_allowed_bulk(pairs) -> set:
+    """Check many (text, entity_type) pairs against a single snapshot read.
+
+    Returns the set of input texts that are allowed. One read of the module
+    global instead of one per detected span.
+    """
+    snapshot = _allowedlist
+    allowed = set()
+    seen = set()
+    for text, entity_type in pairs:
+        # The same entity often appears several times in one message;
+        # normalize and probe each distinct text only once.
+        if text in seen:
+            continue
+        seen.add(text)
+        normalized = text.lower()
+        if entity_type == 'PHONE':
+            normalized = normalized.replace(" ", "")
+        if normalized in snapshot:
+            allowed.add(text)
+    return allowed
 
 def is_allowed(text: str, entity_type: str = None) -> bool:
     # Normalize text
@@ -2,19 +2,139 @@ from cat.mad_hatter.decorators import hook, plugin
 from cat.looking_glass.stray_cat import StrayCat
 from langchain.docstore.document import Document
 from typing import Dict, Tuple, List
-import uuid
+from collections import OrderedDict
+import re
+import functools
+import itertools
 import json
 import os
 from cat.log import log
 from urllib.parse import urlparse
 
-from .detectors import create_detector, check_and_download_spacy_models
-from .allowedlist import init_allowedlist, add_entity, is_allowed
+from .detectors import (
+    create_detector,
+    check_and_download_spacy_models,
+    remove_overlapping_spans,
+)
+from .allowedlist import init_allowedlist, add_entities, is_allowed_bulk
+
+# Settings that affect detector construction, as (name, default) pairs.
+# Detector instances are cached at module level keyed by these values, so
+# regex patterns are compiled (and SpaCy pipeline state resolved) once per
+# settings combination instead of on every message. The boolean flags are
+# packed into one int (bit i = i-th entry here), so the cache key is a
+# compact (mask, threshold) pair instead of a nine-wide tuple.
+_DETECTOR_FLAGS = (
+    ("anonymize_email", True),
+    ("anonymize_phone", True),
+    ("anonymize_fiscal_code", True),
+    ("anonymize_license_plate", True),
+    ("anonymize_names", True),
+    ("anonymize_locations", True),
+    ("anonymize_organizations", True),
+    ("use_beam_ner", False),
+)
+_REGEX_DETECTOR_CACHE = {}
+_SPACY_DETECTOR_CACHE = {}
+
+# Bumped whenever settings are saved, invalidating the per-cat settings cache.
+_settings_generation = 0
+
+_SETTINGS_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "settings.json"
+)
+
+
+def _settings_mtime() -> float:
+    """Modification time of settings.json, 0.0 if it does not exist yet."""
+    try:
+        return os.path.getmtime(_SETTINGS_FILE)
+    except OSError:
+        return 0.0
+
+# Skip building and serializing INFO payloads entirely when the log level
+# filters them out anyway (Cheshire Cat reads the level from CCAT_LOG_LEVEL).
+_LOG_INFO_ENABLED = os.getenv("CCAT_LOG_LEVEL", "INFO").upper() in ("DEBUG", "INFO")
+
+
+def _log_event(level: str, event: str, data: Dict):
+    """Emit a structured log line, serializing only when it will be shown."""
+    if level == "info" and not _LOG_INFO_ENABLED:
+        return
+    getattr(log, level)(
+        json.dumps(
+            {"component": "ccat_anonymizer", "event": event, "data": data}
+        )
+    )
+
+
+# One resolved settings dict shared by every session: (key, settings).
+# Settings are identical across cats, so there is no reason to re-load and
+# re-validate them once per StrayCat instance.
+_settings_cache = None
+
+
+def _load_settings(cat) -> Dict:
+    """Load plugin settings, caching the resolved dict at module scope.
+
+    The hook chain for a single message (reads_message, recall_query,
+    sends_message) would otherwise re-load the settings JSON three or four
+    times per turn, and every new session would start cold.
+    """
+    global _settings_cache
+    # Key on both the save-generation counter and the settings file mtime, so
+    # out-of-band edits to settings.json are picked up too (one stat per call
+    # instead of a read + json parse).
+    key = (_settings_generation, _settings_mtime())
+    cached = _settings_cache
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    settings = cat.mad_hatter.get_plugin().load_settings()
+    _settings_cache = (key, settings)
+    return settings
+
+
+def _detector_settings_key(settings: Dict) -> Tuple:
+    """Build a compact cache key from the detector-relevant settings."""
+    mask = 0
+    for bit, (name, default) in enumerate(_DETECTOR_FLAGS):
+        if settings.get(name, default):
+            mask |= 1 << bit
+    return (
+        mask,
+        settings.get("confidence_threshold"),
+        settings.get("ner_batch_size"),
+    )
+
+
+def _get_or_create_detector(detector_type: str, settings: Dict):
+    """Return a cached detector for these settings, creating it on first use.
+
+    A failed SpaCy construction is cached too (as the RuntimeError itself),
+    so an unavailable model is re-raised immediately instead of re-running
+    the load/download attempt on every message.
+    """
+    cache = (
+        _REGEX_DETECTOR_CACHE if detector_type == "regex" else _SPACY_DETECTOR_CACHE
+    )
+    key = _detector_settings_key(settings)
+    detector = cache.get(key)
+    if isinstance(detector, RuntimeError):
+        raise detector
+    if detector is None:
+        try:
+            detector = create_detector(detector_type, settings=settings)
+        except RuntimeError as e:
+            cache[key] = e
+            raise
+        cache[key] = detector
+    return detector
 
 
 @hook
 def after_cat_bootstrap(cat):
-    settings = cat.mad_hatter.get_plugin().load_settings()
+    settings = _load_settings(cat)
     if settings.get("enable_allowedlist", True):
         db_path = settings.get("sqlite_db_path", "cat/data/anon_allowedlist.db")
         init_allowedlist(db_path)
@@ -35,183 +155,295 @@ def after_cat_bootstrap(cat):
             log.error(f"CCAT Anonymizer: Failed to initialize Spacy models: {e}")
 
 
-def _remove_overlapping_spans(
-    spans: List[Tuple[int, int, str, str]],
-) -> List[Tuple[int, int, str, str]]:
-    """Remove overlapping spans, preferring longer matches."""
-    if not spans:
-        return spans
+# Monotonic placeholder ids: collision-free by construction, deterministic
+# for tests, and cheaper than a CSPRNG read per detected entity. Formatted to
+# the fixed 8-hex-char shape that _PLACEHOLDER_PATTERN expects.
+_placeholder_counter = itertools.count()
 
-    # Sort by start position, then by length (descending)
-    spans.sort(key=lambda x: (x[0], -(x[1] - x[0])))
 
-    non_overlapping = []
-    last_end = -1
+def generate_placeholder(entity_type: str) -> str:
+    """Generate a placeholder for anonymized data."""
+    return f"[{entity_type}_{next(_placeholder_counter) & 0xFFFFFFFF:08x}]"
 
-    for span in spans:
-        start, end, entity_type, text = span
-        if start >= last_end:
-            non_overlapping.append(span)
-            last_end = end
 
-    return non_overlapping
+# SpaCy spans precomputed in batch by after_rabbithole_splitted_text, keyed by
+# chunk text and consumed (popped) by _detect_entities during insertion.
+_precomputed_spacy_spans: Dict[str, List] = {}
 
 
-def generate_placeholder(entity_type: str) -> str:
-    """Generate a placeholder for anonymized data."""
-    # Create a unique identifier for this entity
-    unique_id = str(uuid.uuid4())[:8]
-    return f"[{entity_type}_{unique_id}]"
+@hook(priority=1)
+def after_rabbithole_splitted_text(chunks, cat):
+    """
+    Run SpaCy NER over all rabbit hole chunks in one nlp.pipe batch.
+
+    before_rabbithole_insert_memory is invoked once per chunk, which would
+    otherwise mean one SpaCy forward pass per chunk. Precomputing here lets
+    SpaCy batch the whole document set and the per-chunk hook just picks up
+    its spans.
+    """
+    try:
+        settings = _load_settings(cat)
+        enable_spacy = (
+            settings.get("anonymize_names", True)
+            or settings.get("anonymize_locations", True)
+            or settings.get("anonymize_organizations", True)
+        )
+        if not enable_spacy or not chunks:
+            return chunks
+
+        # With lazy SpaCy the insert hook never consumes NER spans, so don't
+        # precompute them either.
+        if settings.get("lazy_spacy", True):
+            return chunks
+
+        # Same when no consumer exists at all: the insert hook only reads
+        # precomputed spans to feed the allowedlist or to anonymize chunks.
+        if not (
+            settings.get("enable_allowedlist", True)
+            or settings.get("anonymize_rabbit_hole", False)
+        ):
+            return chunks
 
+        spacy_detector = _get_or_create_detector("spacy", settings)
+        texts = [chunk.page_content for chunk in chunks]
 
-def _detect_entities(text: str, cat: StrayCat) -> List[Tuple[int, int, str, str]]:
-    settings = cat.mad_hatter.get_plugin().load_settings()
+        _precomputed_spacy_spans.clear()
+        for chunk_text, spans in zip(texts, spacy_detector.detect_batch(texts)):
+            _precomputed_spacy_spans[chunk_text] = spans
 
-    # Check if any SpaCy detection is enabled
+    except Exception as e:
+        _log_event("error", "detection_error", {"detector": "spacy_batch", "error": str(e)})
+
+    return chunks
+
+
+# Coarse necessary-condition gate: emails need '@', phones and fiscal codes
+# need digits, names/organizations/locations need an uppercase character. The
+# regex covers the common Latin-script case cheaply; texts it rejects get one
+# Unicode-aware isupper() fallback scan so ALL-CAPS names ("MARIO ROSSI") and
+# non-Latin scripts ("Иван Петров") are not skipped. Only genuinely caseless,
+# digit-free, '@'-free text bypasses detection.
+_PII_GATE = re.compile(r"[@\d]|\b[A-Z][a-z]{2,}\b")
+
+
+def _detect_entities(
+    text: str, cat: StrayCat, settings: Dict = None, use_spacy: bool = None
+) -> List[Tuple[int, int, str, str]]:
+    # Cheap pre-scan: most chat messages ("hi", "thanks", "ok") carry no PII
+    # candidates at all, so skip detector and SpaCy work entirely for them.
+    if not text or len(text) < 3:
+        return []
+    if _PII_GATE.search(text) is None and not any(c.isupper() for c in text):
+        return []
+
+    if settings is None:
+        settings = _load_settings(cat)
+
+    # Check if any SpaCy detection is enabled; a caller can force it off
+    # (lazy_spacy ingestion) via the use_spacy override.
     enable_spacy = (
         settings.get("anonymize_names", True)
         or settings.get("anonymize_locations", True)
         or settings.get("anonymize_organizations", True)
     )
+    if use_spacy is False:
+        enable_spacy = False
 
     all_spans = []
 
     # Always use regex for emails, phones, and fiscal codes
     try:
-        regex_detector = create_detector("regex", settings=settings)
+        regex_detector = _get_or_create_detector("regex", settings)
         regex_spans = regex_detector.detect(text)
         all_spans.extend(regex_spans)
 
     except Exception as e:
-        log.error(
-            json.dumps(
-                {
-                    "component": "ccat_anonymizer",
-                    "event": "detection_error",
-                    "data": {"detector": "regex", "error": str(e)},
-                }
-            )
-        )
+        _log_event("error", "detection_error", {"detector": "regex", "error": str(e)})
 
     # Optionally use SpaCy for names, organizations, and addresses
     if enable_spacy:
+        # Mask of character positions already claimed by regex spans: an NER
+        # entity starting inside an email/phone/fiscal-code match can never
+        # survive overlap resolution, so drop it before the merge.
+        covered = bytearray(len(text))
+        for start, end, _, _ in all_spans:
+            covered[start:end] = b"\x01" * (end - start)
+
         try:
-            spacy_detector = create_detector("spacy", settings=settings)
-            spacy_spans = spacy_detector.detect(text)
-            all_spans.extend(spacy_spans)
+            spacy_detector = _get_or_create_detector("spacy", settings)
+            # Reuse spans precomputed in batch during rabbit hole splitting
+            spacy_spans = _precomputed_spacy_spans.pop(text, None)
+            if spacy_spans is None:
+                spacy_spans = spacy_detector.detect(text)
+            all_spans.extend(
+                span for span in spacy_spans if covered[span[0]] == 0
+            )
 
         except RuntimeError as e:
-            log.error(
-                json.dumps(
-                    {
-                        "component": "ccat_anonymizer",
-                        "event": "detection_error",
-                        "data": {"detector": "spacy", "error": str(e)},
-                    }
-                )
-            )
-            log.info(
-                json.dumps(
-                    {
-                        "component": "ccat_anonymizer",
-                        "event": "detection_fallback",
-                        "data": {"message": "Continuing with regex detection only"},
-                    }
-                )
-            )
+            _log_event("error", "detection_error", {"detector": "spacy", "error": str(e)})
+            _log_event("info", "detection_fallback", {"message": "Continuing with regex detection only"})
         except Exception as e:
-            log.error(
-                json.dumps(
-                    {
-                        "component": "ccat_anonymizer",
-                        "event": "detection_error",
-                        "data": {"detector": "spacy", "error": str(e)},
-                    }
-                )
-            )
+            _log_event("error", "detection_error", {"detector": "spacy", "error": str(e)})
 
     # Remove overlapping spans
-    all_spans = _remove_overlapping_spans(all_spans)
+    all_spans = remove_overlapping_spans(all_spans)
     return all_spans
 
 
 def anonymize_text(
-    text: str, cat: StrayCat, check_allowedlist: bool = True
+    text: str,
+    cat: StrayCat,
+    check_allowedlist: bool = True,
+    use_spacy: bool = None,
+    spans: List[Tuple[int, int, str, str]] = None,
 ) -> Tuple[str, Dict[str, str]]:
     """
     Anonymize text using regex detection for emails, phones, and Italian fiscal codes,
     and optionally SpaCy detection for names, organizations, and addresses.
 
+    A caller that already ran _detect_entities on this text can pass the
+    result via spans to skip a second detection pass.
+
     Returns:
         Tuple of (anonymized_text, mapping_dict)
     """
-    settings = cat.mad_hatter.get_plugin().load_settings()
+    settings = _load_settings(cat)
     enable_allowedlist = settings.get("enable_allowedlist", True)
 
-    all_spans = _detect_entities(text, cat)
+    all_spans = (
+        list(spans)
+        if spans is not None
+        else _detect_entities(text, cat, settings, use_spacy=use_spacy)
+    )
 
     if all_spans:
         entity_types = [span[2] for span in all_spans]
-        log.info(
-            json.dumps(
-                {
-                    "component": "ccat_anonymizer",
-                    "event": "pii_detection",
-                    "data": {
-                        "total_found": len(all_spans),
-                        "entity_types": list(set(entity_types)),
-                    },
-                }
-            )
-        )
+        _log_event("info", "pii_detection", {
+            "total_found": len(all_spans),
+            "entity_types": list(set(entity_types)),
+        })
+
+    # Drop allowed entities up front so they don't participate in sorting,
+    # placeholder generation, or the string rebuild.
+    skipped_allowed = []
+    if check_allowedlist and enable_allowedlist and all_spans:
+        allowed_texts = is_allowed_bulk((span[3], span[2]) for span in all_spans)
+        if allowed_texts:
+            kept = []
+            for span in all_spans:
+                if span[3] in allowed_texts:
+                    skipped_allowed.append(span[3])
+                else:
+                    kept.append(span)
+            all_spans = kept
 
-    # Sort spans by start position in reverse order to avoid offset issues
-    all_spans.sort(key=lambda x: x[0], reverse=True)
+    # Nothing left to replace: skip the rebuild (and its logging) entirely
+    if not all_spans and not skipped_allowed:
+        return text, {}
 
-    anonymized_text = text
+    # Sort spans by start position and assemble the result in one pass,
+    # avoiding a full string copy per replaced span.
+    all_spans.sort(key=lambda x: x[0])
+
+    parts = []
+    cursor = 0
     mapping = {}
-    skipped_allowed = []
+    placeholder_by_text = {}
 
     for start, end, entity_type, entity_text in all_spans:
-        # Check allowedlist
-        if (
-            check_allowedlist
-            and enable_allowedlist
-            and is_allowed(entity_text, entity_type)
-        ):
-            skipped_allowed.append(entity_text)
-            continue
-
-        placeholder = generate_placeholder(entity_type)
-        anonymized_text = anonymized_text[:start] + placeholder + anonymized_text[end:]
-        mapping[placeholder] = entity_text
+        # Repeated occurrences of the same entity share one placeholder, so
+        # the LLM sees a consistent token and the mapping stays small.
+        placeholder = placeholder_by_text.get(entity_text)
+        if placeholder is None:
+            placeholder = generate_placeholder(entity_type)
+            placeholder_by_text[entity_text] = placeholder
+            mapping[placeholder] = entity_text
+        parts.append(text[cursor:start])
+        parts.append(placeholder)
+        cursor = end
+
+    parts.append(text[cursor:])
+    anonymized_text = "".join(parts)
 
     if mapping or skipped_allowed:
-        log.info(
-            json.dumps(
-                {
-                    "component": "ccat_anonymizer",
-                    "event": "text_anonymization",
-                    "data": {
-                        "original_length": len(text),
-                        "anonymized_length": len(anonymized_text),
-                        "entities_replaced": len(mapping),
-                        "entities_skipped_allowedlist": len(skipped_allowed),
-                        "allowed_entities": skipped_allowed,
-                    },
-                }
-            )
-        )
+        _log_event("info", "text_anonymization", {
+            "original_length": len(text),
+            "anonymized_length": len(anonymized_text),
+            "entities_replaced": len(mapping),
+            "entities_skipped_allowedlist": len(skipped_allowed),
+            "allowed_entities": skipped_allowed,
+        })
 
     return anonymized_text, mapping
 
 
-def deanonymize_text(text: str, mapping: Dict[str, str]) -> str:
-    """Restore original data from anonymized text using mapping."""
-    deanonymized_text = text
+# Placeholders all share the [TYPE_xxxxxxxx] shape from generate_placeholder,
+# so one pattern compiled at import time finds them all in a single pass.
+_PLACEHOLDER_PATTERN = re.compile(r"\[[A-Z_]+_[0-9a-f]{8}\]")
+
+
+def deanonymize_text(text: str, mapping: Dict[str, str]) -> Tuple[str, int]:
+    """Restore original data from anonymized text using mapping.
+
+    Returns the restored text and the number of placeholders replaced,
+    counted during the substitution pass itself.
+    """
+    if not mapping:
+        return text, 0
+    restored = 0
+
+    def _restore(m):
+        nonlocal restored
+        original = mapping.get(m.group(0))
+        if original is None:
+            # Unknown lookalikes are left untouched.
+            return m.group(0)
+        restored += 1
+        return original
+
+    # Single pass: match anything placeholder-shaped and restore it if it is
+    # in the mapping.
+    return _PLACEHOLDER_PATTERN.sub(_restore, text), restored
+
+
+# Cap on placeholder -> original pairs kept per session. Placeholders older
+# than the cap can no longer appear in fresh LLM output, while an unbounded
+# dict would grow for the whole life of a chatty session.
+_PII_MAPPING_MAX = 4096
+
+
+def _store_mapping(cat: StrayCat, mapping: Dict[str, str]):
+    """Merge new placeholder mappings into the session store, evicting oldest."""
+    store = getattr(cat, "_pii_mapping", None)
+    if store is None:
+        store = cat._pii_mapping = OrderedDict()
     for placeholder, original in mapping.items():
-        deanonymized_text = deanonymized_text.replace(placeholder, original)
-    return deanonymized_text
+        store[placeholder] = original
+        store.move_to_end(placeholder)
+    while len(store) > _PII_MAPPING_MAX:
+        store.popitem(last=False)
+
+
+@functools.lru_cache(maxsize=4)
+def _get_allowed_prefixes(spec: str) -> Tuple[Tuple[str, str], ...]:
+    """Parse the comma-separated allowed_websites setting once per value.
+
+    Returns (domain, path_prefix) tuples; memoized so a crawl of N pages
+    parses the setting once instead of N times.
+    """
+    prefixes = []
+    for allowed in (w.strip() for w in spec.split(",")):
+        if not allowed:
+            continue
+        if allowed.startswith(("http://", "https://")):
+            parsed_allowed = urlparse(allowed)
+            prefixes.append((parsed_allowed.netloc, parsed_allowed.path))
+        elif "/" in allowed:
+            parts = allowed.split("/", 1)
+            prefixes.append((parts[0], "/" + parts[1]))
+        else:
+            prefixes.append((allowed, ""))
+    return tuple(prefixes)
 
 
 @hook(priority=1)
@@ -221,44 +453,31 @@ def before_rabbithole_insert_memory(doc: Document, cat: StrayCat) -> Document:
     This protects PII in scraped websites and uploaded documents.
     Only runs if anonymize_rabbit_hole setting is enabled.
     """
-    settings = cat.mad_hatter.get_plugin().load_settings()
+    settings = _load_settings(cat)
     enable_allowedlist = settings.get("enable_allowedlist", True)
 
-    # Detect entities and add to allowedlist
+    # Lazy SpaCy: ingestion runs regex-only and NER stays a query-time cost
+    use_spacy = not settings.get("lazy_spacy", True)
+
+    # Detect entities and add to allowedlist; the spans are reused below so
+    # anonymization does not run detection a second time on the same text.
+    spans = None
     if enable_allowedlist:
         try:
-            spans = _detect_entities(doc.page_content, cat)
-            added_count = 0
+            spans = _detect_entities(doc.page_content, cat, settings, use_spacy=use_spacy)
             source = doc.metadata.get("source", "unknown")
-            for _, _, entity_type, entity_text in spans:
-                # add_entity checks for duplicates, but we don't get a return value.
-                # We'll just count detected entities for now.
-                add_entity(entity_text, entity_type, source)
-                added_count += 1
+            added_count = add_entities(
+                (entity_text, entity_type, source)
+                for _, _, entity_type, entity_text in spans
+            )
 
             if added_count > 0:
-                log.info(
-                    json.dumps(
-                        {
-                            "component": "ccat_anonymizer",
-                            "event": "allowedlist_update",
-                            "data": {
-                                "source": source,
-                                "entities_added_count": added_count,
-                            },
-                        }
-                    )
-                )
+                _log_event("info", "allowedlist_update", {
+                    "source": source,
+                    "entities_added_count": added_count,
+                })
         except Exception as e:
-            log.error(
-                json.dumps(
-                    {
-                        "component": "ccat_anonymizer",
-                        "event": "allowedlist_error",
-                        "data": {"error": str(e)},
-                    }
-                )
-            )
+            _log_event("error", "allowedlist_error", {"error": str(e)})
 
     # Check if rabbit hole anonymization is enabled
     anonymize_rabbit_hole = settings.get("anonymize_rabbit_hole", False)
@@ -267,39 +486,22 @@ def before_rabbithole_insert_memory(doc: Document, cat: StrayCat) -> Document:
 
     allowed_websites = settings.get("allowed_websites", "")
     if allowed_websites:
-        allowed_list = [w.strip() for w in allowed_websites.split(",") if w.strip()]
         source = doc.metadata.get("source", "")
         if source:
-            domain = urlparse(source).netloc
-            path = urlparse(source).path
-            for allowed in allowed_list:
-                if allowed.startswith(("http://", "https://")):
-                    parsed_allowed = urlparse(allowed)
-                    allowed_domain = parsed_allowed.netloc
-                    allowed_path = parsed_allowed.path
-                else:
-                    if "/" in allowed:
-                        parts = allowed.split("/", 1)
-                        allowed_domain = parts[0]
-                        allowed_path = "/" + parts[1]
-                    else:
-                        allowed_domain = allowed
-                        allowed_path = ""
+            parsed = urlparse(source)
+            domain, path = parsed.netloc, parsed.path
+            for allowed_domain, allowed_path in _get_allowed_prefixes(allowed_websites):
                 if domain == allowed_domain and path.startswith(allowed_path):
-                    log.info(
-                        json.dumps(
-                            {
-                                "component": "ccat_anonymizer",
-                                "event": "anonymization_skipped",
-                                "data": {"reason": "allowed_website", "source": source},
-                            }
-                        )
-                    )
+                    _log_event("info", "anonymization_skipped", {"reason": "allowed_website", "source": source})
                     return doc
 
     try:
         anonymized_content, mapping = anonymize_text(
-            doc.page_content, cat, check_allowedlist=False
+            doc.page_content,
+            cat,
+            check_allowedlist=False,
+            use_spacy=use_spacy,
+            spans=spans,
         )
 
         # Create a new document with anonymized content
@@ -310,15 +512,7 @@ def before_rabbithole_insert_memory(doc: Document, cat: StrayCat) -> Document:
         return anonymized_doc
 
     except Exception as e:
-        log.error(
-            json.dumps(
-                {
-                    "component": "ccat_anonymizer",
-                    "event": "anonymization_error",
-                    "data": {"context": "document", "error": str(e)},
-                }
-            )
-        )
+        _log_event("error", "anonymization_error", {"context": "document", "error": str(e)})
         return doc
 
 
@@ -332,7 +526,7 @@ def cat_recall_query(user_message: str, cat) -> str:
         if "anonymized_user_message_text" in cat.working_memory:
             return cat.working_memory.anonymized_user_message_text
 
-        settings = cat.mad_hatter.get_plugin().load_settings()
+        settings = _load_settings(cat)
 
         if not user_message:
             return user_message
@@ -344,38 +538,18 @@ def cat_recall_query(user_message: str, cat) -> str:
 
         if reversible_chat:
             # Store the mapping in the StrayCat instance for this session
-            if not hasattr(cat, "_pii_mapping"):
-                cat._pii_mapping = {}
-
-            # Merge mappings (in case there are multiple calls)
-            cat._pii_mapping.update(mapping)
-
-        log.info(
-            json.dumps(
-                {
-                    "component": "ccat_anonymizer",
-                    "event": "cat_recall_query_anonymization",
-                    "data": {
-                        "original_length": len(user_message),
-                        "anonymized_length": len(anonymized_message),
-                        "anonymized_content": anonymized_message,
-                    },
-                }
-            )
-        )
+            _store_mapping(cat, mapping)
+
+        _log_event("info", "cat_recall_query_anonymization", {
+            "original_length": len(user_message),
+            "anonymized_length": len(anonymized_message),
+            "anonymized_content": anonymized_message,
+        })
 
         return anonymized_message
 
     except Exception as e:
-        log.error(
-            json.dumps(
-                {
-                    "component": "ccat_anonymizer",
-                    "event": "anonymization_error",
-                    "data": {"context": "cat_recall_query", "error": str(e)},
-                }
-            )
-        )
+        _log_event("error", "anonymization_error", {"context": "cat_recall_query", "error": str(e)})
         return user_message
 
 
@@ -389,7 +563,7 @@ def before_cat_reads_message(user_message_json: dict, cat) -> dict:
 
     try:
         user_message = user_message_json.get("text", "")
-        settings = cat.mad_hatter.get_plugin().load_settings()
+        settings = _load_settings(cat)
 
         if not user_message:
             return user_message_json
@@ -404,41 +578,21 @@ def before_cat_reads_message(user_message_json: dict, cat) -> dict:
 
         if reversible_chat:
             # Store the mapping in the StrayCat instance for this session
-            if not hasattr(cat, "_pii_mapping"):
-                cat._pii_mapping = {}
-
-            # Merge mappings (in case there are multiple calls)
-            cat._pii_mapping.update(mapping)
+            _store_mapping(cat, mapping)
 
         # Update the user message with anonymized content
         user_message_json.text = anonymized_message
 
-        log.info(
-            json.dumps(
-                {
-                    "component": "ccat_anonymizer",
-                    "event": "user_message_anonymization",
-                    "data": {
-                        "original_length": len(user_message),
-                        "anonymized_length": len(anonymized_message),
-                        "anonymized_content": anonymized_message,
-                    },
-                }
-            )
-        )
+        _log_event("info", "user_message_anonymization", {
+            "original_length": len(user_message),
+            "anonymized_length": len(anonymized_message),
+            "anonymized_content": anonymized_message,
+        })
 
         return user_message_json
 
     except Exception as e:
-        log.error(
-            json.dumps(
-                {
-                    "component": "ccat_anonymizer",
-                    "event": "anonymization_error",
-                    "data": {"context": "user_message", "error": str(e)},
-                }
-            )
-        )
+        _log_event("error", "anonymization_error", {"context": "user_message", "error": str(e)})
         return user_message_json
 
 
@@ -449,7 +603,7 @@ def before_cat_sends_message(message: Dict, cat: StrayCat) -> Dict:
     This restores the original PII data in the response.
     """
     try:
-        settings = cat.mad_hatter.get_plugin().load_settings()
+        settings = _load_settings(cat)
 
         # Check if reversible chat is enabled
         reversible_chat = settings.get("reversible_chat", True)
@@ -466,26 +620,23 @@ def before_cat_sends_message(message: Dict, cat: StrayCat) -> Dict:
         if not content:
             return message
 
+        # Every placeholder starts with '[': if none is present the response
+        # cannot contain anything to restore, so skip the regex pass.
+        if "[" not in content:
+            return message
+
         # Deanonymize the content
-        deanonymized_content = deanonymize_text(content, cat._pii_mapping)
+        deanonymized_content, restored_count = deanonymize_text(
+            content, cat._pii_mapping
+        )
 
         # Check if content actually changed
         if deanonymized_content != content:
-            log.info(
-                json.dumps(
-                    {
-                        "component": "ccat_anonymizer",
-                        "event": "text_deanonymization",
-                        "data": {
-                            "mappings_available": len(cat._pii_mapping),
-                            "success": True,
-                            "restored_count": len(
-                                [k for k in cat._pii_mapping if k in content]
-                            ),  # Approximate count
-                        },
-                    }
-                )
-            )
+            _log_event("info", "text_deanonymization", {
+                "mappings_available": len(cat._pii_mapping),
+                "success": True,
+                "restored_count": restored_count,
+            })
 
         # Update the message with deanonymized content
         message.deanonymized = deanonymized_content
@@ -493,15 +644,7 @@ def before_cat_sends_message(message: Dict, cat: StrayCat) -> Dict:
         return message
 
     except Exception as e:
-        log.error(
-            json.dumps(
-                {
-                    "component": "ccat_anonymizer",
-                    "event": "deanonymization_error",
-                    "data": {"error": str(e)},
-                }
-            )
-        )
+        _log_event("error", "deanonymization_error", {"error": str(e)})
         return message
 
 
@@ -533,6 +676,10 @@ def save_plugin_settings_to_file(settings, plugin_path):
 @plugin
 def save_settings(settings):
     """Handle plugin settings save with optional database deletion."""
+    global _settings_generation
+    # Invalidate the per-cat settings cache
+    _settings_generation += 1
+
     reset_db = settings.get("reset_db", False)
 
     if reset_db:
@@ -547,43 +694,19 @@ def save_settings(settings):
         try:
             if os.path.exists(file_path):
                 os.remove(file_path)
-                log.info(
-                    json.dumps(
-                        {
-                            "component": "ccat_anonymizer",
-                            "event": "database_reset",
-                            "data": {"status": "success", "path": file_path},
-                        }
-                    )
-                )
+                _log_event("info", "database_reset", {"status": "success", "path": file_path})
 
                 # Re-initialize the allowedlist (empty)
                 init_allowedlist(db_path)
 
             else:
-                log.warning(
-                    json.dumps(
-                        {
-                            "component": "ccat_anonymizer",
-                            "event": "database_reset",
-                            "data": {
-                                "status": "warning",
-                                "message": "File does not exist",
-                                "path": file_path,
-                            },
-                        }
-                    )
-                )
+                _log_event("warning", "database_reset", {
+                    "status": "warning",
+                    "message": "File does not exist",
+                    "path": file_path,
+                })
         except Exception as e:
-            log.error(
-                json.dumps(
-                    {
-                        "component": "ccat_anonymizer",
-                        "event": "database_reset",
-                        "data": {"status": "error", "error": str(e), "path": file_path},
-                    }
-                )
-            )
+            _log_event("error", "database_reset", {"status": "error", "error": str(e), "path": file_path})
 
         # Reset the flag
         settings["reset_db"] = False
